@@ -5,16 +5,114 @@ Twitter API 权限检查脚本
 用于检查当前 API 凭证的权限级别和可用功能
 """
 
+import asyncio
 import os
+
+import httpx
+import oauthlib.oauth1
+import orjson
 import tweepy
-import requests
-from requests_oauthlib import OAuth1
 from dotenv import load_dotenv
 
+from verify_cache import cached_user, verify_credentials
+
 # 加载环境变量
 load_dotenv()
 
-def check_api_credentials():
+
+MEDIA_UPLOAD_URL = "https://upload.twitter.com/1.1/media/upload.json"
+
+
+# 每个检查步骤返回 (是否通过, 输出行)，全部并发执行后再按固定顺序打印
+
+async def _step_verify(api, credentials):
+    """1. 检查基本认证"""
+    try:
+        user, from_cache = await asyncio.to_thread(verify_credentials, api, credentials)
+    except tweepy.Unauthorized:
+        return False, ["❌ 认证失败 - 请检查 API 凭证"]
+    suffix = "（缓存）" if from_cache else ""
+    return True, [
+        f"✅ 认证成功{suffix}: @{user.screen_name}",
+        f"   用户ID: {user.id}",
+        f"   账户创建时间: {user.created_at}",
+    ]
+
+
+async def _step_app_info(api):
+    """2. 检查应用权限"""
+    lines = []
+    try:
+        # 尝试获取应用信息
+        app_info = await asyncio.to_thread(api.get_application_rate_limit_status)
+        lines.append("✅ 可以访问应用速率限制信息")
+        
+        # 检查媒体上传端点的速率限制
+        media_limits = app_info.get('resources', {}).get('media', {})
+        if media_limits:
+            lines.append("✅ 检测到媒体相关的 API 端点")
+            for endpoint, limit_info in media_limits.items():
+                lines.append(f"   {endpoint}: {limit_info}")
+        else:
+            lines.append("⚠️  未检测到媒体相关的 API 端点")
+            
+    except Exception as e:
+        lines.append(f"⚠️  无法获取应用信息: {e}")
+    return True, lines
+
+
+async def _step_write_permission(api):
+    """3. 检查写入权限"""
+    try:
+        # 尝试获取用户时间线（需要读权限）
+        await asyncio.to_thread(api.user_timeline, count=1)
+    except tweepy.Forbidden:
+        return False, ["❌ 权限不足 - 可能是只读权限"]
+    except Exception as e:
+        return True, [f"⚠️  权限检查异常: {e}"]
+    # 检查是否可以创建推文（但不实际创建）
+    # 这里我们只检查权限，不实际发推
+    return True, ["✅ 读权限正常", "✅ 基本写权限检查通过"]
+
+
+async def _step_media_endpoint(client, api_key, api_secret, access_token, access_secret):
+    """4. 直接测试媒体上传端点"""
+    # 使用 OAuth1 签名，发送一个空的 POST 请求来测试端点访问（不实际上传文件）
+    signer = oauthlib.oauth1.Client(
+        api_key,
+        client_secret=api_secret,
+        resource_owner_key=access_token,
+        resource_owner_secret=access_secret,
+    )
+    _, headers, _ = signer.sign(MEDIA_UPLOAD_URL, "POST")
+    try:
+        response = await client.post(MEDIA_UPLOAD_URL, headers=headers)
+    except Exception as e:
+        return False, [f"❌ 媒体上传端点测试失败: {e}"]
+    
+    if response.status_code == 400:
+        return True, ["✅ 媒体上传端点可访问（返回400是因为没有提供媒体文件）"]
+    if response.status_code == 403:
+        return False, ["❌ 媒体上传端点访问被拒绝 - 权限不足", f"   响应: {response.text}"]
+    return True, [f"⚠️  媒体上传端点返回状态码: {response.status_code}", f"   响应: {response.text}"]
+
+
+async def _step_bearer(client, bearer_token):
+    """5. 检查 Bearer Token"""
+    headers = {"Authorization": f"Bearer {bearer_token}"}
+    try:
+        # 测试 v2 API 访问
+        v2_response = await client.get("https://api.twitter.com/2/users/me", headers=headers)
+    except Exception as e:
+        return True, [f"⚠️  Bearer Token 测试失败: {e}"]
+    
+    if v2_response.status_code == 200:
+        user_data = orjson.loads(v2_response.content)
+        return True, [f"✅ Bearer Token 有效: @{user_data['data']['username']}"]
+    return True, [f"⚠️  Bearer Token 问题: {v2_response.status_code}"]
+
+
+async def check_api_credentials():
     """检查 API 凭证和权限"""
     print("🔍 检查 Twitter API 凭证和权限...")
     print("=" * 50)
@@ -30,122 +128,61 @@ def check_api_credentials():
         print("❌ 缺少必需的 API 凭证")
         return False
     
-    try:
-        # 1. 检查基本认证
-        print("\n1️⃣ 检查基本认证...")
-        auth = tweepy.OAuth1UserHandler(api_key, api_secret, access_token, access_secret)
-        api = tweepy.API(auth)
-        
-        user = api.verify_credentials()
-        print(f"✅ 认证成功: @{user.screen_name}")
-        print(f"   用户ID: {user.id}")
-        print(f"   账户创建时间: {user.created_at}")
-        
-        # 2. 检查应用信息
-        print("\n2️⃣ 检查应用权限...")
-        try:
-            # 尝试获取应用信息
-            app_info = api.get_application_rate_limit_status()
-            print("✅ 可以访问应用速率限制信息")
-            
-            # 检查媒体上传端点的速率限制
-            media_limits = app_info.get('resources', {}).get('media', {})
-            if media_limits:
-                print("✅ 检测到媒体相关的 API 端点")
-                for endpoint, limit_info in media_limits.items():
-                    print(f"   {endpoint}: {limit_info}")
-            else:
-                print("⚠️  未检测到媒体相关的 API 端点")
-                
-        except Exception as e:
-            print(f"⚠️  无法获取应用信息: {e}")
-        
-        # 3. 测试写入权限
-        print("\n3️⃣ 检查写入权限...")
-        try:
-            # 尝试获取用户时间线（需要读权限）
-            timeline = api.user_timeline(count=1)
-            print("✅ 读权限正常")
-            
-            # 检查是否可以创建推文（但不实际创建）
-            # 这里我们只检查权限，不实际发推
-            print("✅ 基本写权限检查通过")
-            
-        except tweepy.Forbidden:
-            print("❌ 权限不足 - 可能是只读权限")
-            return False
-        except Exception as e:
-            print(f"⚠️  权限检查异常: {e}")
-        
-        # 4. 直接测试媒体上传端点
-        print("\n4️⃣ 测试媒体上传端点访问...")
-        
-        # 使用 OAuth1 测试媒体上传端点
-        oauth1_auth = OAuth1(api_key, api_secret, access_token, access_secret)
-        
-        # 创建一个最小的测试请求（不实际上传文件）
-        test_url = "https://upload.twitter.com/1.1/media/upload.json"
-        
-        try:
-            # 发送一个空的 POST 请求来测试端点访问
-            response = requests.post(test_url, auth=oauth1_auth, timeout=10)
-            
-            if response.status_code == 400:
-                print("✅ 媒体上传端点可访问（返回400是因为没有提供媒体文件）")
-            elif response.status_code == 403:
-                print("❌ 媒体上传端点访问被拒绝 - 权限不足")
-                print(f"   响应: {response.text}")
-                return False
-            else:
-                print(f"⚠️  媒体上传端点返回状态码: {response.status_code}")
-                print(f"   响应: {response.text}")
-                
-        except Exception as e:
-            print(f"❌ 媒体上传端点测试失败: {e}")
-            return False
-        
-        # 5. 检查 Bearer Token（如果有）
-        if bearer_token:
-            print("\n5️⃣ 检查 Bearer Token...")
-            headers = {"Authorization": f"Bearer {bearer_token}"}
-            
-            try:
-                # 测试 v2 API 访问
-                v2_response = requests.get(
-                    "https://api.twitter.com/2/users/me", 
-                    headers=headers, 
-                    timeout=10
-                )
-                
-                if v2_response.status_code == 200:
-                    user_data = v2_response.json()
-                    print(f"✅ Bearer Token 有效: @{user_data['data']['username']}")
-                else:
-                    print(f"⚠️  Bearer Token 问题: {v2_response.status_code}")
-                    
-            except Exception as e:
-                print(f"⚠️  Bearer Token 测试失败: {e}")
-        
-        print("\n" + "=" * 50)
-        print("📋 权限检查总结:")
-        print("✅ 基本认证: 通过")
-        print("✅ 读权限: 通过") 
-        print("❓ 媒体上传权限: 需要在 Twitter Developer Portal 中确认")
-        
-        print("\n🔧 如果媒体上传仍然失败，请检查:")
-        print("1. 应用权限是否设置为 'Read and Write'")
-        print("2. 是否需要重新生成 Access Token")
-        print("3. 是否有 Twitter API v1.1 的访问权限")
-        print("4. 账户是否通过了 Twitter 开发者审核")
-        
-        return True
-        
-    except tweepy.Unauthorized:
-        print("❌ 认证失败 - 请检查 API 凭证")
-        return False
-    except Exception as e:
-        print(f"❌ 检查失败: {e}")
+    credentials = (api_key, api_secret, access_token, access_secret)
+    auth = tweepy.OAuth1UserHandler(*credentials)
+    api = tweepy.API(auth)
+    # 命中认证缓存时跳过应用信息检查，凭证在有效期内已检查过
+    from_cache = cached_user(credentials) is not None
+    
+    # 两个 HTTP 探测共用一个 HTTP/2 客户端
+    async with httpx.AsyncClient(http2=True, timeout=10) as client:
+        # (标题, 检查协程, 跳过时的说明)；协程为 None 表示跳过该步骤
+        steps = [
+            ("1️⃣ 检查基本认证...", _step_verify(api, credentials), None),
+            ("2️⃣ 检查应用权限...", None if from_cache else _step_app_info(api), "已跳过（使用缓存的认证结果）"),
+            ("3️⃣ 检查写入权限...", _step_write_permission(api), None),
+            ("4️⃣ 测试媒体上传端点访问...",
+             _step_media_endpoint(client, api_key, api_secret, access_token, access_secret), None),
+            ("5️⃣ 检查 Bearer Token...", _step_bearer(client, bearer_token) if bearer_token else None, None),
+        ]
+        outcomes = await asyncio.gather(
+            *(step for _, step, _ in steps if step is not None), return_exceptions=True
+        )
+    
+    outcomes = iter(outcomes)
+    success = True
+    for title, step, skip_note in steps:
+        if step is None:
+            if skip_note:
+                print(f"\n{title} {skip_note}")
+            continue
+        print(f"\n{title}")
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            print(f"❌ 检查失败: {outcome}")
+            success = False
+            continue
+        passed, lines = outcome
+        for line in lines:
+            print(line)
+        success = success and passed
+    
+    if not success:
         return False
+    
+    print("\n" + "=" * 50)
+    print("📋 权限检查总结:")
+    print("✅ 基本认证: 通过")
+    print("✅ 读权限: 通过") 
+    print("❓ 媒体上传权限: 需要在 Twitter Developer Portal 中确认")
+    
+    print("\n🔧 如果媒体上传仍然失败，请检查:")
+    print("1. 应用权限是否设置为 'Read and Write'")
+    print("2. 是否需要重新生成 Access Token")
+    print("3. 是否有 Twitter API v1.1 的访问权限")
+    print("4. 账户是否通过了 Twitter 开发者审核")
+    
+    return True
 
 def print_troubleshooting_guide():
     """打印故障排除指南"""
@@ -171,7 +208,7 @@ def print_troubleshooting_guide():
     print("   - 检查是否有任何限制或暂停")
 
 if __name__ == "__main__":
-    success = check_api_credentials()
+    success = asyncio.run(check_api_credentials())
     print_troubleshooting_guide()
     
     if not success:
@@ -9,33 +9,37 @@
 4. 依赖包是否正确安装
 
 使用方法：
-    python deploy_check.py
+    python deploy_check.py            # 只输出错误/警告和一行 JSON 汇总
+    python deploy_check.py --verbose  # 同时输出每一项检查的详细过程
 """
 
+import argparse
+import asyncio
+import importlib.metadata
 import os
 import sys
 import logging
-import requests
+import httpx
+import orjson
 import tweepy
 from pathlib import Path
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 
-# 设置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s"
-)
+from verify_cache import verify_credentials
+
 logger = logging.getLogger(__name__)
 
+
 def check_environment_variables():
     """检查必需的环境变量"""
-    logger.info("🔍 检查环境变量...")
+    logger.debug("🔍 检查环境变量...")
     
     # 加载 .env 文件
     env_file = Path(".env")
     if env_file.exists():
         load_dotenv()
-        logger.info("✅ 找到 .env 文件")
+        logger.debug("✅ 找到 .env 文件")
     else:
         logger.warning("⚠️  未找到 .env 文件，将检查系统环境变量")
     
@@ -52,13 +56,14 @@ def check_environment_variables():
         if not value:
             missing_vars.append(var)
             logger.error(f"❌ 缺少环境变量: {var}")
-        else:
-            logger.info(f"✅ {var}: {'*' * (len(value) - 4)}{value[-4:]}")
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug("✅ %s: %s%s", var, "*" * (len(value) - 4), value[-4:])
     
     # 检查可选变量
     bearer_token = os.getenv("TWITTER_BEARER_TOKEN")
     if bearer_token:
-        logger.info(f"✅ TWITTER_BEARER_TOKEN: {'*' * (len(bearer_token) - 4)}{bearer_token[-4:]}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("✅ TWITTER_BEARER_TOKEN: %s%s", "*" * (len(bearer_token) - 4), bearer_token[-4:])
     else:
         logger.warning("⚠️  TWITTER_BEARER_TOKEN 未设置（可选）")
     
@@ -66,12 +71,27 @@ def check_environment_variables():
         logger.error(f"❌ 缺少 {len(missing_vars)} 个必需的环境变量")
         return False
     
-    logger.info("✅ 所有必需的环境变量都已设置")
+    logger.debug("✅ 所有必需的环境变量都已设置")
     return True
 
-def check_network_connectivity():
-    """检查网络连接"""
-    logger.info("🌐 检查网络连接...")
+async def _tcp_probe(url):
+    """TCP 连接探测：能发现 DNS 解析和防火墙问题，省去 TLS 握手和 HTTP 解析"""
+    _, writer = await asyncio.wait_for(asyncio.open_connection(urlparse(url).hostname, 443), timeout=5)
+    writer.close()
+    await writer.wait_closed()
+
+
+async def _https_probe(client, url):
+    """HEAD 探测，只取状态码不下载响应体；服务器不支持 HEAD 时回退到 GET"""
+    response = await client.head(url)
+    if response.status_code == 405:
+        response = await client.get(url)
+    return response.status_code
+
+
+async def check_network_connectivity():
+    """检查网络连接（并发探测所有地址）"""
+    logger.debug("🌐 检查网络连接...")
     
     test_urls = [
         "https://api.twitter.com",
@@ -79,26 +99,39 @@ def check_network_connectivity():
         "https://www.google.com"
     ]
     
-    for url in test_urls:
-        try:
-            response = requests.get(url, timeout=10)
-            logger.info(f"✅ {url}: {response.status_code}")
-        except requests.exceptions.Timeout:
+    results = await asyncio.gather(*(_tcp_probe(url) for url in test_urls), return_exceptions=True)
+    
+    connected = True
+    for url, result in zip(test_urls, results):
+        if isinstance(result, TimeoutError):
             logger.error(f"❌ {url}: 连接超时")
-            return False
-        except requests.exceptions.ConnectionError:
-            logger.error(f"❌ {url}: 连接错误")
-            return False
-        except Exception as e:
-            logger.error(f"❌ {url}: {str(e)}")
-            return False
+            connected = False
+        elif isinstance(result, OSError):
+            logger.error(f"❌ {url}: 连接错误 ({result})")
+            connected = False
+        elif isinstance(result, Exception):
+            logger.error(f"❌ {url}: {str(result)}")
+            connected = False
+        else:
+            logger.debug(f"✅ {url}: TCP 443 可连接")
     
-    logger.info("✅ 网络连接正常")
-    return True
+    # --verbose 时额外做 HTTPS 探测，输出各地址的 HTTP 状态码
+    if connected and logger.isEnabledFor(logging.DEBUG):
+        # 所有探测共用一个 HTTP/2 客户端
+        async with httpx.AsyncClient(http2=True, timeout=5, follow_redirects=True) as client:
+            statuses = await asyncio.gather(
+                *(_https_probe(client, url) for url in test_urls), return_exceptions=True
+            )
+        for url, status in zip(test_urls, statuses):
+            logger.debug(f"   {url}: HTTPS {status}")
+    
+    if connected:
+        logger.debug("✅ 网络连接正常")
+    return connected
 
 def check_twitter_credentials():
     """检查 Twitter API 凭证"""
-    logger.info("🐦 检查 Twitter API 凭证...")
+    logger.debug("🐦 检查 Twitter API 凭证...")
     
     try:
         # 检查环境变量
@@ -118,12 +151,13 @@ def check_twitter_credentials():
         api = tweepy.API(auth)
         
         # 验证凭证
-        user = api.verify_credentials()
-        logger.info(f"✅ Twitter API 认证成功: @{user.screen_name}")
+        user, from_cache = verify_credentials(api, (api_key, api_secret, access_token, access_secret))
+        suffix = "（缓存）" if from_cache else ""
+        logger.debug(f"✅ Twitter API 认证成功{suffix}: @{user.screen_name}")
         
         # 检查权限
-        logger.info(f"✅ 用户ID: {user.id}")
-        logger.info(f"✅ 关注者数: {user.followers_count}")
+        logger.debug(f"✅ 用户ID: {user.id}")
+        logger.debug(f"✅ 关注者数: {user.followers_count}")
         
         return True
         
@@ -139,38 +173,44 @@ def check_twitter_credentials():
 
 def check_dependencies():
     """检查依赖包"""
-    logger.info("📦 检查依赖包...")
+    logger.debug("📦 检查依赖包...")
     
     required_packages = [
         "fastapi",
         "uvicorn", 
         "tweepy",
-        "requests",
-        "requests-oauthlib",
+        "oauthlib",
+        "httpx",
+        "certifi",
+        "orjson",
         "python-dotenv",
-        "pydantic"
     ]
     
+    # 只读取已安装分发包的元数据，不实际导入（导入 fastapi/tweepy 等很慢且有副作用）
+    installed = {
+        (dist.metadata["Name"] or "").lower().replace("_", "-")
+        for dist in importlib.metadata.distributions()
+    }
+    
     missing_packages = []
     for package in required_packages:
-        try:
-            __import__(package.replace("-", "_"))
-            logger.info(f"✅ {package}")
-        except ImportError:
+        if package.lower() in installed:
+            logger.debug(f"✅ {package}")
+        else:
             missing_packages.append(package)
             logger.error(f"❌ 缺少包: {package}")
     
     if missing_packages:
         logger.error(f"❌ 缺少 {len(missing_packages)} 个依赖包")
-        logger.info("请运行: pip install -r requirements.txt")
+        logger.warning("请运行: pip install -r requirements.txt")
         return False
     
-    logger.info("✅ 所有依赖包都已安装")
+    logger.debug("✅ 所有依赖包都已安装")
     return True
 
 def check_test_image():
     """检查测试图片文件"""
-    logger.info("🖼️  检查测试图片...")
+    logger.debug("🖼️  检查测试图片...")
     
     test_images = ["image.png", "test.png", "sample.png"]
     
@@ -178,7 +218,7 @@ def check_test_image():
         img_path = Path(img)
         if img_path.exists():
             size = img_path.stat().st_size
-            logger.info(f"✅ 找到测试图片: {img} ({size} bytes)")
+            logger.debug(f"✅ 找到测试图片: {img} ({size} bytes)")
             
             # 检查文件大小
             if size > 5 * 1024 * 1024:  # 5MB
@@ -187,13 +227,12 @@ def check_test_image():
             return True
     
     logger.warning("⚠️  未找到测试图片文件")
-    logger.info("建议创建一个测试图片文件 (image.png)")
+    logger.debug("建议创建一个测试图片文件 (image.png)")
     return False
 
-def main():
-    """主检查函数"""
-    logger.info("🚀 开始部署环境检查...")
-    logger.info("=" * 50)
+async def main():
+    """主检查函数（彼此独立的检查并发执行）"""
+    logger.debug("🚀 开始部署环境检查...")
     
     checks = [
         ("环境变量", check_environment_variables),
@@ -203,36 +242,46 @@ def main():
         ("测试图片", check_test_image)
     ]
     
+    # 环境变量检查会加载 .env，Twitter 凭证检查依赖它，所以先单独执行
+    (env_name, env_check), *concurrent_checks = checks
     results = {}
-    for name, check_func in checks:
-        logger.info(f"\n📋 检查 {name}...")
-        try:
-            results[name] = check_func()
-        except Exception as e:
-            logger.error(f"❌ {name} 检查失败: {str(e)}")
-            results[name] = False
+    try:
+        results[env_name] = env_check()
+    except Exception as e:
+        logger.error(f"❌ {env_name} 检查失败: {str(e)}")
+        results[env_name] = False
     
-    # 总结
-    logger.info("\n" + "=" * 50)
-    logger.info("📊 检查结果总结:")
+    # 其余检查互不依赖：协程直接调度，阻塞函数放到线程池
+    outcomes = await asyncio.gather(
+        *(
+            check_func() if asyncio.iscoroutinefunction(check_func) else asyncio.to_thread(check_func)
+            for _, check_func in concurrent_checks
+        ),
+        return_exceptions=True,
+    )
+    for (name, _), outcome in zip(concurrent_checks, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f"❌ {name} 检查失败: {str(outcome)}")
+            results[name] = False
+        else:
+            results[name] = outcome
     
-    passed = 0
+    # 总结：只输出一行结构化 JSON，便于日志系统采集
+    passed = sum(1 for result in results.values() if result)
     total = len(results)
-    
-    for name, result in results.items():
-        status = "✅ 通过" if result else "❌ 失败"
-        logger.info(f"  {name}: {status}")
-        if result:
-            passed += 1
-    
-    logger.info(f"\n🎯 总体结果: {passed}/{total} 项检查通过")
-    
-    if passed == total:
-        logger.info("🎉 所有检查都通过！环境配置正确。")
-        return 0
-    else:
-        logger.error("💥 部分检查失败，请修复上述问题后重新运行。")
-        return 1
+    summary = {"passed": passed, "total": total, "checks": results}
+    level = logging.INFO if passed == total else logging.ERROR
+    logger.log(level, "deploy_check_summary %s", orjson.dumps(summary).decode())
+    return 0 if passed == total else 1
 
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="验证云服务器部署环境")
+    parser.add_argument("--verbose", action="store_true", help="输出每一项检查的详细过程")
+    args = parser.parse_args()
+    
+    # 设置日志
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s"
+    )
+    sys.exit(asyncio.run(main()))
\ No newline at end of file
@@ -13,31 +13,87 @@ Set the following environment variables before starting the server:
     TWITTER_ACCESS_TOKEN
     TWITTER_ACCESS_TOKEN_SECRET
     TWITTER_BEARER_TOKEN (optional but recommended)
+    RACE_UPLOADERS (optional, set to 1 to run all uploaders concurrently)
+    RACE_STAGGER (optional, seconds between uploader starts when racing, default 0.2)
+    APPEND_CONCURRENCY (optional, chunked upload segments sent at once, default 2)
+    LOG_LEVEL (optional, e.g. DEBUG or INFO, default WARNING)
 
 Run locally with:
     uvicorn main:app --reload
 """
 from __future__ import annotations
 
+import asyncio
 import logging
+import math
 import os
+import ssl
+import time
+from contextlib import asynccontextmanager, suppress
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from functools import lru_cache
 from pathlib import Path
-from typing import Callable, Optional
-
-import requests
-import tweepy
-from fastapi import FastAPI, HTTPException, Query
+from typing import AsyncIterator, Awaitable, BinaryIO, Callable, Optional
+
+import certifi
+import httpx
+import oauthlib.oauth1
+import orjson
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from requests_oauthlib import OAuth1
 from dotenv import load_dotenv
 
 load_dotenv()
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING").upper()
+# An unknown level name would make basicConfig raise and keep the service from starting.
+_log_level_valid = LOG_LEVEL in logging.getLevelNamesMapping()
+logging.basicConfig(
+    level=LOG_LEVEL if _log_level_valid else logging.WARNING,
+    format="%(asctime)s %(levelname)s %(message)s",
+)
+if not _log_level_valid:
+    logger.warning("Ignoring invalid LOG_LEVEL=%r, using WARNING", LOG_LEVEL)
+
+
+def env_float(name: str, default: float) -> float:
+    """Read an optional numeric setting, falling back to the default instead of failing at import."""
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    try:
+        value = float(raw)
+    except ValueError:
+        value = math.nan
+    if not math.isfinite(value):
+        logger.warning("Ignoring invalid %s=%r, using %s", name, raw, default)
+        return default
+    return value
+
+
+def env_int(name: str, default: int, minimum: int = 1) -> int:
+    """Read an optional integer setting of at least ``minimum``, falling back to the default when invalid."""
+    raw = os.getenv(name)
+    if raw is None:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        value = minimum - 1
+    if value < minimum:
+        logger.warning("Ignoring invalid %s=%r, using %s", name, raw, default)
+        return default
+    return value
 
 
-class Settings(BaseModel):
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """Credentials read once from the environment; frozen so it can key the lru_caches."""
+
     api_key: str
     api_secret: str
     access_token: str
@@ -65,195 +121,620 @@ class TweetRequest(BaseModel):
     image_path: str = "image.png"
 
 
-app = FastAPI(title="OurMixPost Twitter Service")
+@lru_cache(maxsize=1)
+def get_ssl_context() -> ssl.SSLContext:
+    """
+    Load the certifi CA bundle once and share the context between clients.
+
+    httpx already builds one SSL context per AsyncClient, so with the single long-lived client this
+    saves nothing per request; it only avoids reloading the bundle if more clients are created later.
+    """
+    return ssl.create_default_context(cafile=certifi.where())
 
 
-def upload_media_v1(settings: Settings, image_path: Path) -> Optional[str]:
-    """Upload media using the legacy upload endpoint with OAuth1 signing."""
-    logger.info("Trying media upload via v1.1 OAuth endpoint")
-    auth = OAuth1(
-        settings.api_key,
-        settings.api_secret,
-        settings.access_token,
-        settings.access_secret,
+def create_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http1=True,
+        http2=True,
+        verify=get_ssl_context(),
+        timeout=30,
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60),
     )
-    
-    try:
-        files = {"media": (image_path.name, image_path.read_bytes(), "image/png")}
-        data = {"media_category": "tweet_image", "media_type": "image/png"}
-        
-        response = requests.post(
-            "https://upload.twitter.com/1.1/media/upload.json", 
-            auth=auth, 
-            files=files, 
-            data=data, 
-            timeout=60,  # 增加超时时间
-            verify=True  # 确保SSL验证
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # One client for the life of the process so requests reuse pooled (HTTP/2) keep-alive connections.
+    async with create_http_client() as client:
+        app.state.http = client
+        yield
+
+
+app = FastAPI(title="OurMixPost Twitter Service", default_response_class=ORJSONResponse, lifespan=lifespan)
+
+
+MEDIA_UPLOAD_URL = "https://upload.twitter.com/1.1/media/upload.json"
+TWEETS_URL = "https://api.twitter.com/2/tweets"
+MEDIA_CHUNK_SIZE = 1024 * 1024
+# Chunked APPENDs in flight at once: each holds one segment in memory, so this trades peak memory for parallelism.
+APPEND_CONCURRENCY = env_int("APPEND_CONCURRENCY", 2)
+MAX_MEDIA_BYTES = 5 * 1024 * 1024  # Twitter限制为5MB
+
+MEDIA_SIGNATURES: tuple[tuple[bytes, str], ...] = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+
+class InvalidMediaError(ValueError):
+    """Raised when the image is rejected locally, before any network round trip."""
+
+
+class PermanentAuthError(RuntimeError):
+    """Raised when Twitter rejects the OAuth1 credentials; the other OAuth1 uploaders are skipped, bearer still runs."""
+
+
+def detect_media_type(head: bytes) -> Optional[str]:
+    """Identify a supported image format from its first 12 bytes."""
+    for signature, media_type in MEDIA_SIGNATURES:
+        if head.startswith(signature):
+            return media_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+@lru_cache(maxsize=64)
+def sniff_media_type(path: str, mtime_ns: int, size: int) -> Optional[str]:
+    """
+    Read and classify the image header once per file version.
+
+    Keyed on mtime and size so a rewritten file is sniffed again. Only the detected type is
+    cached, not the image bytes.
+    """
+    with open(path, "rb") as f:
+        return detect_media_type(f.read(12))
+
+
+@dataclass(frozen=True)
+class MediaFile:
+    """An opened image handed to the uploaders."""
+
+    path: Path
+    file: BinaryIO
+    size: int
+    media_type: str
+
+    @property
+    def media_category(self) -> str:
+        return "tweet_gif" if self.media_type == "image/gif" else "tweet_image"
+
+
+class OAuth1(httpx.Auth):
+    """OAuth 1.0a (HMAC-SHA1) request signing for httpx, mirroring requests_oauthlib.OAuth1."""
+
+    def __init__(self, api_key: str, api_secret: str, access_token: str, access_secret: str) -> None:
+        self._client = oauthlib.oauth1.Client(
+            api_key,
+            client_secret=api_secret,
+            resource_owner_key=access_token,
+            resource_owner_secret=access_secret,
         )
-        
-        logger.info("v1.1 upload response: status=%d, content_length=%d", 
-                   response.status_code, len(response.content))
-        
-        if response.status_code == 200:
-            result = response.json()
-            media_id = result.get("media_id_string")
-            logger.info("v1.1 upload successful, media_id: %s", media_id)
-            return media_id
+
+    def auth_flow(self, request: httpx.Request):
+        # Only form-encoded bodies take part in the signature; multipart uploads are signed without them.
+        content_type = request.headers.get("Content-Type", "")
+        if content_type.startswith("application/x-www-form-urlencoded"):
+            _, headers, _ = self._client.sign(
+                str(request.url),
+                request.method,
+                body=request.content.decode(),
+                headers={"Content-Type": content_type},
+            )
         else:
-            logger.error("Media upload v1 failed: %s - %s", response.status_code, response.text)
-            # 记录响应头信息用于调试
-            logger.error("Response headers: %s", dict(response.headers))
-            return None
-            
-    except requests.exceptions.Timeout:
-        logger.error("v1.1 upload timeout after 60 seconds")
-        return None
-    except requests.exceptions.ConnectionError as e:
-        logger.error("v1.1 upload connection error: %s", str(e))
-        return None
-    except requests.exceptions.RequestException as e:
-        logger.error("v1.1 upload request error: %s", str(e))
-        return None
-    except Exception as e:
-        logger.error("v1.1 upload unexpected error: %s", str(e))
-        return None
+            _, headers, _ = self._client.sign(str(request.url), request.method)
+        request.headers["Authorization"] = headers["Authorization"]
+        yield request
 
 
-def upload_media_bearer(settings: Settings, image_path: Path) -> Optional[str]:
-    """Upload media using bearer token if available."""
-    if not settings.bearer_token:
-        logger.info("Bearer token not available, skipping bearer upload")
-        return None
-        
-    logger.info("Trying media upload via bearer token")
-    headers = {"Authorization": f"Bearer {settings.bearer_token}"}
-    
+@lru_cache(maxsize=1)
+def get_oauth1(settings: Settings) -> OAuth1:
+    """Reuse one signer per (frozen, hashable) Settings; nonce and timestamp are still generated per request."""
+    return OAuth1(settings.api_key, settings.api_secret, settings.access_token, settings.access_secret)
+
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Connection-level failures worth another attempt; RemoteProtocolError covers a stale keep-alive/HTTP2
+# connection that the server closed without responding.
+RETRYABLE_ERRORS = (httpx.NetworkError, httpx.RemoteProtocolError)
+AUTH_FAILURE_STATUSES = frozenset({401, 403})
+UPLOAD_ATTEMPTS = 3
+RETRY_BACKOFF = 1.0
+
+
+def retry_delay(response: Optional[httpx.Response], attempt: int) -> float:
+    """Honour Retry-After (delta-seconds or HTTP-date) when present, otherwise back off exponentially."""
+    retry_after = response.headers.get("retry-after", "") if response is not None else ""
+    if retry_after.isdigit():
+        return float(retry_after)
+    if retry_after:
+        try:
+            when = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            pass
+        else:
+            if when.tzinfo is None:
+                when = when.replace(tzinfo=timezone.utc)
+            return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    return RETRY_BACKOFF * 2 ** attempt
+
+
+async def post_with_retry(
+    client: httpx.AsyncClient,
+    label: str,
+    deadline: float,
+    *,
+    url: str = MEDIA_UPLOAD_URL,
+    rewind: Optional[BinaryIO] = None,
+    **kwargs,
+) -> httpx.Response:
+    """
+    POST to ``url`` (media/upload.json by default), retrying 429/5xx responses and connection errors.
+
+    Retries stop after UPLOAD_ATTEMPTS or when the wait would overrun ``deadline`` (a monotonic time);
+    the last response is returned, or the last connection error re-raised. ``rewind`` is seeked back
+    to the start before every attempt so a streamed file body can be sent again.
+    """
+    attempt = 0
+    while True:
+        if rewind is not None:
+            rewind.seek(0)
+        try:
+            response = await client.post(url, timeout=deadline - time.monotonic(), **kwargs)
+        except RETRYABLE_ERRORS as e:
+            response, error = None, e
+        else:
+            if response.status_code not in RETRY_STATUSES:
+                return response
+            error = None
+
+        delay = retry_delay(response, attempt)
+        attempt += 1
+        if attempt == UPLOAD_ATTEMPTS or time.monotonic() + delay >= deadline:
+            if error is not None:
+                raise error
+            return response
+        if error is not None:
+            logger.warning("%s connection error, retrying in %.1f seconds: %s", label, delay, error)
+        else:
+            logger.warning("%s got %d, retrying in %.1f seconds", label, response.status_code, delay)
+        await asyncio.sleep(delay)
+
+
+async def _do_upload(
+    label: str,
+    media: MediaFile,
+    client: httpx.AsyncClient,
+    timeout: float,
+    *,
+    auth: Optional[httpx.Auth] = None,
+    headers: Optional[dict[str, str]] = None,
+) -> Optional[str]:
+    """Single-shot POST to media/upload.json shared by the v1.1 OAuth and bearer uploaders.
+
+    429/5xx responses and connection errors are retried on the pooled connection,
+    as long as the wait still fits inside ``timeout``.
+    """
+    logger.debug("Trying media upload via %s", label)
+
+    files = {"media": (media.path.name, media.file, media.media_type)}
+    # Metadata travels in the query string so the multipart body is just the streamed file part.
+    params = {"media_category": media.media_category, "media_type": media.media_type}
+
     try:
-        files = {"media": (image_path.name, image_path.read_bytes(), "image/png")}
-        data = {"media_category": "tweet_image", "media_type": "image/png"}
-        
-        response = requests.post(
-            "https://upload.twitter.com/1.1/media/upload.json", 
-            headers=headers, 
-            files=files, 
-            data=data, 
-            timeout=60,  # 增加超时时间
-            verify=True  # 确保SSL验证
+        response = await post_with_retry(
+            client,
+            f"{label} upload",
+            time.monotonic() + timeout,
+            rewind=media.file,
+            auth=auth,
+            headers=headers,
+            params=params,
+            files=files,
         )
-        
-        logger.info("Bearer upload response: status=%d, content_length=%d", 
-                   response.status_code, len(response.content))
-        
+
+        if logger.isEnabledFor(logging.DEBUG):
+            size = len(response.content)
+            logger.debug("%s upload response: status=%d, content_length=%d",
+                         label, response.status_code, size,
+                         extra={"status": response.status_code, "bytes": size})
+
         if response.status_code == 200:
-            result = response.json()
+            result = orjson.loads(response.content)
             media_id = result.get("media_id_string")
-            logger.info("Bearer upload successful, media_id: %s", media_id)
+            logger.info("%s upload successful, media_id: %s", label, media_id, extra={"media_id": media_id})
             return media_id
-        else:
-            logger.error("Bearer upload failed: %s - %s", response.status_code, response.text)
-            logger.error("Response headers: %s", dict(response.headers))
-            return None
-            
-    except requests.exceptions.Timeout:
-        logger.error("Bearer upload timeout after 60 seconds")
+
+    except httpx.TimeoutException:
+        logger.error("%s upload timeout after %.1f seconds", label, timeout)
         return None
-    except requests.exceptions.ConnectionError as e:
-        logger.error("Bearer upload connection error: %s", str(e))
+    except RETRYABLE_ERRORS as e:
+        logger.error("%s upload connection error: %s", label, e)
         return None
-    except requests.exceptions.RequestException as e:
-        logger.error("Bearer upload request error: %s", str(e))
+    except httpx.HTTPError as e:
+        logger.error("%s upload request error: %s", label, e)
         return None
-    except Exception as e:
-        logger.error("Bearer upload unexpected error: %s", str(e))
+    except ValueError as e:
+        logger.error("%s upload returned an unreadable response: %s", label, e)
         return None
 
+    logger.error("%s upload failed: %s - %s", label, response.status_code, response.text)
+    # 记录响应头信息用于调试
+    logger.error("Response headers: %s", response.headers)
+    # Bearer tokens are routinely refused here, so only OAuth1 rejections are treated as permanent.
+    if auth is not None and response.status_code in AUTH_FAILURE_STATUSES:
+        raise PermanentAuthError(f"{label} credentials rejected: {response.status_code}")
+    return None
+
+
+async def upload_media_v1(
+    settings: Settings, media: MediaFile, client: httpx.AsyncClient, timeout: float
+) -> Optional[str]:
+    """Upload media using the legacy upload endpoint with OAuth1 signing."""
+    return await _do_upload("v1.1 OAuth", media, client, timeout, auth=get_oauth1(settings))
+
+
+async def upload_media_v1_chunked(
+    settings: Settings, media: MediaFile, client: httpx.AsyncClient, timeout: float
+) -> Optional[str]:
+    """
+    Upload media via the v1.1 chunked INIT/APPEND/FINALIZE flow, sending APPEND segments in parallel.
+
+    Each request is retried like the single-shot uploads; all of them share one ``timeout`` budget.
+    """
+    logger.debug("Trying media upload via v1.1 chunked endpoint")
+    auth = get_oauth1(settings)
+    deadline = time.monotonic() + timeout
 
-def upload_media_tweepy(settings: Settings, image_path: Path) -> Optional[str]:
-    """Fallback to tweepy API for media upload."""
-    logger.info("Trying media upload via Tweepy API")
-    
     try:
-        auth = tweepy.OAuth1UserHandler(
-            settings.api_key,
-            settings.api_secret,
-            settings.access_token,
-            settings.access_secret,
-        )
-        api = tweepy.API(auth, wait_on_rate_limit=True)  # 添加速率限制等待
-        
-        logger.info("Uploading file: %s (size: %d bytes)", image_path, image_path.stat().st_size)
-        media = api.media_upload(filename=str(image_path))
-        
-        logger.info("Tweepy upload successful, media_id: %s", media.media_id_string)
-        return media.media_id_string
-        
-    except tweepy.TooManyRequests:
-        logger.error("Tweepy upload failed: Rate limit exceeded")
+        # One budget for the whole INIT/APPEND/FINALIZE sequence.
+        async with asyncio.timeout(timeout):
+            init = await post_with_retry(
+                client,
+                "Chunked upload INIT",
+                deadline,
+                auth=auth,
+                data={
+                    "command": "INIT",
+                    "total_bytes": media.size,
+                    "media_type": media.media_type,
+                    "media_category": media.media_category,
+                },
+            )
+            if not init.is_success:
+                logger.error("Chunked upload INIT failed: %s - %s", init.status_code, init.text)
+                if init.status_code in AUTH_FAILURE_STATUSES:
+                    raise PermanentAuthError(f"Chunked upload credentials rejected: {init.status_code}")
+                return None
+            media_id = orjson.loads(init.content).get("media_id_string")
+            if not media_id:
+                logger.error("Chunked upload INIT returned no media_id: %s", init.text)
+                return None
+            logger.debug("Chunked upload INIT succeeded, media_id: %s", media_id)
+
+            slots = asyncio.Semaphore(APPEND_CONCURRENCY)
+            reading = asyncio.Lock()
+
+            def read_segment(index: int) -> bytes:
+                media.file.seek(index * MEDIA_CHUNK_SIZE)
+                return media.file.read(MEDIA_CHUNK_SIZE)
+
+            async def append(index: int) -> None:
+                async with slots:
+                    # 只在发送前读取该分片，峰值内存为 APPEND_CONCURRENCY 个分片而非整个文件；
+                    # 读取放到线程中执行，锁保证共享句柄的 seek+read 不会交错
+                    async with reading:
+                        read = asyncio.ensure_future(asyncio.to_thread(read_segment, index))
+                        try:
+                            segment = await asyncio.shield(read)
+                        except asyncio.CancelledError:
+                            # 被取消时也等读取线程结束，避免调用方关闭句柄后线程仍在读
+                            await read
+                            raise
+                    response = await post_with_retry(
+                        client,
+                        f"Chunked upload APPEND segment {index}",
+                        deadline,
+                        auth=auth,
+                        data={"command": "APPEND", "media_id": media_id, "segment_index": index},
+                        files={"media": (media.path.name, segment, "application/octet-stream")},
+                    )
+                if not response.is_success:
+                    logger.error("Chunked upload APPEND segment %d failed: %s - %s",
+                                 index, response.status_code, response.text)
+                    # Fail the gather below so the remaining segments are cancelled.
+                    response.raise_for_status()
+
+            segment_count = -(-media.size // MEDIA_CHUNK_SIZE)
+            appends = [asyncio.create_task(append(index)) for index in range(segment_count)]
+            try:
+                await asyncio.gather(*appends)
+            finally:
+                # No APPEND may outlive this call, or the caller's file handle.
+                for task in appends:
+                    task.cancel()
+                await asyncio.gather(*appends, return_exceptions=True)
+
+            finalize = await post_with_retry(
+                client,
+                "Chunked upload FINALIZE",
+                deadline,
+                auth=auth,
+                data={"command": "FINALIZE", "media_id": media_id},
+            )
+            if not finalize.is_success:
+                logger.error("Chunked upload FINALIZE failed: %s - %s", finalize.status_code, finalize.text)
+                return None
+
+            logger.info("Chunked upload successful, media_id: %s (%d segments)", media_id, segment_count)
+            return media_id
+
+    except (httpx.TimeoutException, TimeoutError):
+        logger.error("Chunked upload timeout after %.1f seconds", timeout)
         return None
-    except tweepy.Unauthorized:
-        logger.error("Tweepy upload failed: Unauthorized - check API credentials")
+    except RETRYABLE_ERRORS as e:
+        logger.error("Chunked upload connection error: %s", e)
         return None
-    except tweepy.Forbidden:
-        logger.error("Tweepy upload failed: Forbidden - check API permissions")
+    except httpx.HTTPError as e:
+        logger.error("Chunked upload request error: %s", e)
         return None
-    except tweepy.NotFound:
-        logger.error("Tweepy upload failed: API endpoint not found")
+    except ValueError as e:
+        logger.error("Chunked upload returned an unreadable response: %s", e)
         return None
-    except tweepy.TwitterServerError:
-        logger.error("Tweepy upload failed: Twitter server error")
+
+
+@lru_cache(maxsize=1)
+def get_bearer_headers(settings: Settings) -> Optional[dict[str, str]]:
+    """Build the bearer Authorization header once per Settings."""
+    if not settings.bearer_token:
         return None
-    except Exception as exc:  # Tweepy raises varied exceptions
-        logger.error("Tweepy upload failed with exception: %s (type: %s)", str(exc), type(exc).__name__)
+    return {"Authorization": f"Bearer {settings.bearer_token}"}
+
+
+async def upload_media_bearer(
+    settings: Settings, media: MediaFile, client: httpx.AsyncClient, timeout: float
+) -> Optional[str]:
+    """Upload media using bearer token if available."""
+    headers = get_bearer_headers(settings)
+    if headers is None:
+        logger.info("Bearer token not available, skipping bearer upload")
         return None
+    return await _do_upload("Bearer", media, client, timeout, headers=headers)
+
 
+# Uploaders share one open handle to the image; httpx streams it from disk in chunks.
+Uploader = Callable[[Settings, MediaFile, httpx.AsyncClient, float], Awaitable[Optional[str]]]
 
-UPLOADERS: tuple[Callable[[Settings, Path], Optional[str]], ...] = (
+UPLOADERS: tuple[Uploader, ...] = (
     upload_media_v1,
     upload_media_bearer,
-    upload_media_tweepy,
+    upload_media_v1_chunked,
 )
+# Uploaders signed with the OAuth1 credentials; once those are rejected none of them can succeed.
+OAUTH1_UPLOADERS = frozenset({upload_media_v1, upload_media_v1_chunked})
+
+
+def uploaders_for(file_size: int) -> tuple[Uploader, ...]:
+    """Images larger than one chunk try the chunked upload first; small ones keep it as the last fallback."""
+    if file_size > MEDIA_CHUNK_SIZE:
+        return (upload_media_v1_chunked, upload_media_v1, upload_media_bearer)
+    return UPLOADERS
+
+
+RACE_UPLOADERS = os.getenv("RACE_UPLOADERS") == "1"
+RACE_UPLOADER_TIMEOUT = 8
+# Later uploaders start this many seconds after the previous one, so the preferred order still wins ties.
+# Capped below the per-uploader timeout so a fallback always gets to start while the others still run.
+RACE_STAGGER = min(max(env_float("RACE_STAGGER", 0.2), 0.0), RACE_UPLOADER_TIMEOUT / 2)
+UPLOAD_DEADLINE = 20.0
+TWEET_DEADLINE = 30.0
+
+
+async def race_uploaders(
+    settings: Settings,
+    image_path: Path,
+    file_size: int,
+    media_type: str,
+    client: httpx.AsyncClient,
+    uploaders: tuple[Uploader, ...],
+    deadline: float,
+) -> Optional[str]:
+    """
+    Run all uploaders concurrently and return the first media_id, cancelling the rest.
+
+    Each uploader starts RACE_STAGGER seconds after the previous one, or as soon as the previous
+    one finishes without a media_id. Budgets are cut from ``deadline``, a time.monotonic() value.
+    """
+    started = [asyncio.Event() for _ in uploaders]
+    finished = [asyncio.Event() for _ in uploaders]
+
+    async def attempt(index: int, uploader: Uploader) -> Optional[str]:
+        try:
+            if index:
+                await started[index - 1].wait()
+                with suppress(TimeoutError):
+                    async with asyncio.timeout(RACE_STAGGER):
+                        await finished[index - 1].wait()
+            started[index].set()
+            return await run_attempt(uploader)
+        finally:
+            # Also reached when cancelled, so the next uploader is never left waiting.
+            started[index].set()
+            finished[index].set()
+
+    async def run_attempt(uploader: Uploader) -> Optional[str]:
+        budget = min(RACE_UPLOADER_TIMEOUT, deadline - time.monotonic())
+        if budget <= 0:
+            logger.error("Upload deadline exhausted before %s", uploader.__name__)
+            return None
+        try:
+            # Concurrent uploads each need their own file position; open() can block, so it runs in the threadpool.
+            with await run_in_threadpool(image_path.open, "rb") as handle:
+                async with asyncio.timeout(budget):
+                    media = MediaFile(image_path, handle, file_size, media_type)
+                    return await uploader(settings, media, client, budget)
+        except TimeoutError:
+            logger.error("Upload method %s timed out after %.1f seconds", uploader.__name__, budget)
+        except PermanentAuthError:
+            raise
+        except Exception as e:
+            logger.error("Upload method %s raised exception: %s", uploader.__name__, e)
+        return None
+
+    tasks = {
+        asyncio.create_task(attempt(i, uploader), name=uploader.__name__): uploader
+        for i, uploader in enumerate(uploaders)
+    }
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    media_id = task.result()
+                except PermanentAuthError as e:
+                    logger.error("Upload method %s hit a permanent auth error, skipping other OAuth1 uploaders: %s",
+                                 task.get_name(), e)
+                    skipped = {other for other in pending if tasks[other] in OAUTH1_UPLOADERS}
+                    for other in skipped:
+                        other.cancel()
+                    pending -= skipped
+                    continue
+                if media_id:
+                    logger.info("Media upload succeeded via %s, media_id: %s", task.get_name(), media_id)
+                    return media_id
+                logger.warning("Upload method %s returned None", task.get_name())
+    finally:
+        for task in pending:
+            task.cancel()
+        # Collect every outcome, including tasks finished in the same batch as the winner,
+        # so no exception is left unretrieved.
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    logger.error("All %d upload methods failed", len(uploaders))
+    return None
 
 
-def upload_media(settings: Settings, image_path: Path) -> Optional[str]:
-    """Try each uploader in sequence until one succeeds."""
-    if not image_path.exists():
+def inspect_media(image_path: Path) -> tuple[int, str]:
+    """Validate the image locally and return its size and media type; runs off the event loop."""
+    # 一次 stat 同时完成存在性检查和大小读取
+    try:
+        st = image_path.stat()
+    except FileNotFoundError as exc:
         logger.error("Image file not found: %s", image_path)
-        raise FileNotFoundError(f"Image not found: {image_path}")
+        raise FileNotFoundError(f"Image not found: {image_path}") from exc
     
     # 记录文件信息
-    file_size = image_path.stat().st_size
-    logger.info("Starting media upload for file: %s (size: %d bytes)", image_path, file_size)
+    file_size = st.st_size
+    logger.debug("Starting media upload for file: %s (size: %d bytes)", image_path, file_size)
     
     # 检查文件大小限制 (Twitter限制为5MB)
-    if file_size > 5 * 1024 * 1024:
+    if file_size > MAX_MEDIA_BYTES:
         logger.error("File too large: %d bytes (max 5MB)", file_size)
-        return None
-    
-    for i, uploader in enumerate(UPLOADERS, 1):
-        logger.info("Attempting upload method %d/%d: %s", i, len(UPLOADERS), uploader.__name__)
-        try:
-            media_id = uploader(settings, image_path)
-            if media_id:
-                logger.info("Media upload succeeded via %s, media_id: %s", uploader.__name__, media_id)
-                return media_id
-            else:
-                logger.warning("Upload method %s returned None", uploader.__name__)
-        except Exception as e:
-            logger.error("Upload method %s raised exception: %s", uploader.__name__, str(e))
+        raise InvalidMediaError(f"Image exceeds 5MB: {file_size} bytes")
+
+    # 通过文件头识别格式，损坏或不支持的文件无需发起网络请求
+    media_type = sniff_media_type(str(image_path.absolute()), st.st_mtime_ns, file_size)
+    if media_type is None:
+        logger.error("Unsupported or corrupt image file: %s", image_path)
+        raise InvalidMediaError(f"Unsupported image format: {image_path}")
+
+    return file_size, media_type
+
+
+async def upload_media(
+    settings: Settings,
+    image_path: Path,
+    client: httpx.AsyncClient,
+    deadline_s: float = UPLOAD_DEADLINE,
+) -> Optional[str]:
+    """
+    Try each uploader in sequence (or concurrently with RACE_UPLOADERS=1) until one succeeds.
+
+    All attempts share an overall deadline; each uploader gets whatever budget remains.
+    """
+    deadline = time.monotonic() + deadline_s
+    # 本地文件检查可能阻塞（例如网络盘），放到线程池执行，避免卡住事件循环
+    file_size, media_type = await run_in_threadpool(inspect_media, image_path)
+
+    uploaders = uploaders_for(file_size)
+    if RACE_UPLOADERS:
+        return await race_uploaders(
+            settings, image_path, file_size, media_type, client, uploaders, deadline
+        )
+
+    with await run_in_threadpool(image_path.open, "rb") as handle:
+        media = MediaFile(image_path, handle, file_size, media_type)
+        auth_rejected = False
+        for i, uploader in enumerate(uploaders, 1):
+            if auth_rejected and uploader in OAUTH1_UPLOADERS:
+                logger.warning("Skipping upload method %s: OAuth1 credentials were rejected", uploader.__name__)
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining < 1.0:
+                logger.error("Upload deadline of %.1f seconds exhausted before %s", deadline_s, uploader.__name__)
+                break
+            logger.debug("Attempting upload method %d/%d: %s (budget %.1fs)",
+                         i, len(uploaders), uploader.__name__, remaining)
+            handle.seek(0)
+            try:
+                media_id = await uploader(settings, media, client, remaining)
+                if media_id:
+                    logger.info("Media upload succeeded via %s, media_id: %s", uploader.__name__, media_id)
+                    return media_id
+                else:
+                    logger.warning("Upload method %s returned None", uploader.__name__)
+            except PermanentAuthError as e:
+                logger.error("Upload method %s hit a permanent auth error, skipping other OAuth1 uploaders: %s",
+                             uploader.__name__, e)
+                auth_rejected = True
+            except Exception as e:
+                logger.error("Upload method %s raised exception: %s", uploader.__name__, e)
     
-    logger.error("All %d upload methods failed", len(UPLOADERS))
+    logger.error("All %d upload methods failed", len(uploaders))
     return None
 
 
-def create_twitter_client(settings: Settings) -> tweepy.Client:
-    return tweepy.Client(
-        consumer_key=settings.api_key,
-        consumer_secret=settings.api_secret,
-        access_token=settings.access_token,
-        access_token_secret=settings.access_secret,
-        bearer_token=settings.bearer_token,
-        wait_on_rate_limit=True,
+async def create_tweet_v2(
+    client: httpx.AsyncClient,
+    settings: Settings,
+    text: str,
+    media_ids: list[str],
+    deadline_s: float = TWEET_DEADLINE,
+) -> str:
+    """
+    Create a tweet via the v2 endpoint on the shared client (user-context OAuth1 is required to post).
+
+    429/5xx responses are retried within ``deadline_s`` so a rate limit does not waste the finished upload.
+    """
+    response = await post_with_retry(
+        client,
+        "Create tweet",
+        time.monotonic() + deadline_s,
+        url=TWEETS_URL,
+        auth=get_oauth1(settings),
+        content=orjson.dumps({"text": text, "media": {"media_ids": media_ids}}),
+        headers={"Content-Type": "application/json"},
     )
+    if not response.is_success:
+        raise RuntimeError(f"{response.status_code} - {response.text}")
+    data = orjson.loads(response.content).get("data")
+    tweet_id = data.get("id") if isinstance(data, dict) else None
+    if not tweet_id:
+        raise RuntimeError(f"Tweet response missing data.id: {response.text}")
+    return tweet_id
 
 
 @app.get("/health")
@@ -262,42 +743,45 @@ async def healthcheck():
 
 
 @app.post("/tweet")
-async def tweet(payload: TweetRequest):
-    logger.info("Received tweet request: text='%s', image_path='%s'", payload.text, payload.image_path)
+async def tweet(payload: TweetRequest, request: Request):
+    client: httpx.AsyncClient = request.app.state.http
+    logger.debug("Received tweet request: text='%s', image_path='%s'", payload.text, payload.image_path)
     
     try:
         settings = get_settings()
-        logger.info("Settings loaded successfully")
+        logger.debug("Settings loaded successfully")
     except Exception as e:
-        logger.error("Failed to load settings: %s", str(e))
+        logger.error("Failed to load settings: %s", e)
         raise HTTPException(status_code=500, detail=f"Configuration error: {str(e)}") from e
     
     image_path = Path(payload.image_path)
-    logger.info("Processing image path: %s (absolute: %s)", image_path, image_path.absolute())
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Processing image path: %s (absolute: %s)", image_path, image_path.absolute())
     
     try:
-        media_id = upload_media(settings, image_path)
+        media_id = await upload_media(settings, image_path, client)
     except FileNotFoundError as exc:
-        logger.error("File not found error: %s", str(exc))
+        logger.error("File not found error: %s", exc)
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except InvalidMediaError as exc:
+        logger.error("Invalid media file: %s", exc)
         raise HTTPException(status_code=400, detail=str(exc)) from exc
     except Exception as exc:
-        logger.error("Unexpected error during media upload: %s", str(exc))
+        logger.error("Unexpected error during media upload: %s", exc)
         raise HTTPException(status_code=500, detail=f"Media upload error: {str(exc)}") from exc
 
     if not media_id:
         logger.error("All media upload attempts failed for file: %s", image_path)
         raise HTTPException(status_code=502, detail="All media upload attempts failed")
 
-    logger.info("Media uploaded successfully, creating tweet with media_id: %s", media_id)
+    logger.debug("Media uploaded successfully, creating tweet with media_id: %s", media_id)
     
     try:
-        client = create_twitter_client(settings)
-        response = client.create_tweet(text=payload.text, media_ids=[media_id])
-        tweet_id = response.data.get("id")
+        tweet_id = await create_tweet_v2(client, settings, payload.text, [media_id])
         logger.info("Tweet created successfully: tweet_id=%s", tweet_id)
         return {"tweet_id": tweet_id, "media_id": media_id}
     except Exception as exc:
-        logger.error("Failed to create tweet: %s", str(exc))
+        logger.error("Failed to create tweet: %s", exc)
         raise HTTPException(status_code=502, detail=f"Tweet creation failed: {str(exc)}") from exc
 
 
@@ -0,0 +1,43 @@
+import httpx
+import pytest
+
+import main
+
+PNG_HEADER = b"\x89PNG\r\n\x1a\n"
+
+
+@pytest.fixture
+def settings():
+    return main.Settings("key", "secret", "token", "token-secret", "bearer")
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(main, "RETRY_BACKOFF", 0.01)
+
+
+@pytest.fixture
+def mock_client():
+    """Build an AsyncClient whose requests are answered by ``handler`` instead of the network."""
+
+    def make(handler):
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    return make
+
+
+@pytest.fixture
+def make_media(tmp_path):
+    """Write a PNG of ``size`` bytes and return it opened as a MediaFile."""
+    handles = []
+
+    def make(size=100, name="image.png"):
+        path = tmp_path / name
+        path.write_bytes(PNG_HEADER + b"\0" * (size - len(PNG_HEADER)))
+        handle = path.open("rb")
+        handles.append(handle)
+        return main.MediaFile(path, handle, size, "image/png")
+
+    yield make
+    for handle in handles:
+        handle.close()
@@ -0,0 +1,113 @@
+import asyncio
+import re
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+
+import main
+
+SIZE = 3 * main.MEDIA_CHUNK_SIZE + 10  # four segments
+
+
+def command(request):
+    """Return (command, segment_index) for a form-encoded or multipart media/upload.json request."""
+    body = request.content
+    if request.headers["Content-Type"].startswith("application/x-www-form-urlencoded"):
+        return parse_qs(body.decode())["command"][0], None
+    index = re.search(rb'name="segment_index"\r\n\r\n(\d+)', body)
+    return "APPEND", int(index.group(1))
+
+
+def chunked_handler(calls, *, append=None, init_body=None):
+    def handler(request):
+        name, index = command(request)
+        calls.append((name, index, len(request.content)))
+        if name == "INIT":
+            return httpx.Response(202, json=init_body if init_body is not None else {"media_id_string": "7"})
+        if name == "APPEND":
+            return append(index) if append else httpx.Response(204)
+        return httpx.Response(200, json={"media_id_string": "7"})
+
+    return handler
+
+
+def upload(settings, client, media, timeout=5):
+    return main.upload_media_v1_chunked(settings, media, client, timeout)
+
+
+def test_chunked_upload_sends_every_segment_then_finalizes(settings, mock_client, make_media):
+    calls = []
+
+    async def run():
+        async with mock_client(chunked_handler(calls)) as client:
+            return await upload(settings, client, make_media(SIZE))
+
+    assert asyncio.run(run()) == "7"
+    assert calls[0][0] == "INIT"
+    assert calls[-1][0] == "FINALIZE"
+    assert sorted(index for name, index, _ in calls if name == "APPEND") == [0, 1, 2, 3]
+
+
+def test_chunked_upload_retries_a_failed_segment(settings, mock_client, make_media):
+    calls = []
+    failures = {2: 1}
+
+    def append(index):
+        if failures.get(index):
+            failures[index] -= 1
+            return httpx.Response(503)
+        return httpx.Response(204)
+
+    async def run():
+        async with mock_client(chunked_handler(calls, append=append)) as client:
+            return await upload(settings, client, make_media(SIZE))
+
+    assert asyncio.run(run()) == "7"
+    assert [index for name, index, _ in calls if name == "APPEND"].count(2) == 2
+
+
+def test_chunked_upload_stops_without_media_id(settings, mock_client, make_media):
+    calls = []
+
+    async def run():
+        async with mock_client(chunked_handler(calls, init_body={})) as client:
+            return await upload(settings, client, make_media(SIZE))
+
+    assert asyncio.run(run()) is None
+    assert [name for name, _, _ in calls] == ["INIT"]
+
+
+def test_chunked_upload_raises_permanent_auth_error_on_init_401(settings, mock_client, make_media):
+    async def run():
+        async with mock_client(lambda request: httpx.Response(401)) as client:
+            return await upload(settings, client, make_media(SIZE))
+
+    with pytest.raises(main.PermanentAuthError):
+        asyncio.run(run())
+
+
+def test_failed_append_cancels_the_remaining_segments(settings, mock_client, make_media):
+    finished = []
+
+    async def handler(request):
+        name, index = command(request)
+        if name == "INIT":
+            return httpx.Response(202, json={"media_id_string": "7"})
+        if index == 0:
+            return httpx.Response(400)
+        await asyncio.sleep(0.2)
+        finished.append(index)
+        return httpx.Response(204)
+
+    async def run():
+        async with mock_client(handler) as client:
+            result = await upload(settings, client, make_media(SIZE))
+            returned_with = list(finished)
+            await asyncio.sleep(0.5)
+            return result, returned_with
+
+    result, returned_with = asyncio.run(run())
+    assert result is None
+    # Nothing kept running after the uploader returned.
+    assert finished == returned_with
@@ -0,0 +1,90 @@
+import httpx
+import pytest
+
+import main
+
+
+@pytest.mark.parametrize(
+    "head, expected",
+    [
+        (b"\x89PNG\r\n\x1a\n\0\0\0\0", "image/png"),
+        (b"\xff\xd8\xff\xe0\0\0\0\0\0\0\0\0", "image/jpeg"),
+        (b"GIF89a\0\0\0\0\0\0", "image/gif"),
+        (b"GIF87a\0\0\0\0\0\0", "image/gif"),
+        (b"RIFF\0\0\0\0WEBP", "image/webp"),
+        (b"RIFF\0\0\0\0WAVE", None),
+        (b"not an image", None),
+        (b"", None),
+    ],
+)
+def test_detect_media_type(head, expected):
+    assert main.detect_media_type(head) == expected
+
+
+def test_inspect_media_returns_size_and_type(tmp_path):
+    path = tmp_path / "photo.bin"
+    path.write_bytes(b"GIF89a" + b"\0" * 94)
+    assert main.inspect_media(path) == (100, "image/gif")
+
+
+def test_inspect_media_rejects_unknown_format(tmp_path):
+    path = tmp_path / "image.png"
+    path.write_bytes(b"definitely not a png")
+    with pytest.raises(main.InvalidMediaError):
+        main.inspect_media(path)
+
+
+def test_inspect_media_rejects_oversized_files(tmp_path):
+    path = tmp_path / "image.png"
+    with path.open("wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.truncate(main.MAX_MEDIA_BYTES + 1)
+    with pytest.raises(main.InvalidMediaError):
+        main.inspect_media(path)
+
+
+def test_inspect_media_resniffs_a_rewritten_file(tmp_path):
+    path = tmp_path / "image"
+    path.write_bytes(b"\x89PNG\r\n\x1a\n" + b"\0" * 92)
+    assert main.inspect_media(path)[1] == "image/png"
+    path.write_bytes(b"\xff\xd8\xff" + b"\0" * 200)
+    assert main.inspect_media(path)[1] == "image/jpeg"
+
+
+def sign(auth, request):
+    return next(auth.auth_flow(request)).headers["Authorization"]
+
+
+def test_oauth1_signs_form_bodies_into_the_signature():
+    auth = main.OAuth1("key", "secret", "token", "token-secret")
+    url = main.MEDIA_UPLOAD_URL
+    header = sign(auth, httpx.Request("POST", url, data={"command": "INIT"}))
+    assert header.startswith("OAuth ")
+    assert 'oauth_consumer_key="key"' in header
+    assert 'oauth_token="token"' in header
+
+    # The signature covers the form fields, so changing them changes it even with a fixed nonce/timestamp.
+    auth._client.nonce, auth._client.timestamp = "n", "1"
+    first = sign(auth, httpx.Request("POST", url, data={"command": "INIT"}))
+    second = sign(auth, httpx.Request("POST", url, data={"command": "FINALIZE"}))
+    assert first != second
+
+
+def test_oauth1_signs_multipart_without_the_body(settings):
+    auth = main.get_oauth1(settings)
+    request = httpx.Request("POST", main.MEDIA_UPLOAD_URL, files={"media": ("a.png", b"data", "image/png")})
+    assert sign(auth, request).startswith("OAuth ")
+
+
+def test_env_helpers_fall_back_on_invalid_values(monkeypatch):
+    for raw in ("nan", "inf", "-inf", "abc"):
+        monkeypatch.setenv("XAPI_TEST_FLOAT", raw)
+        assert main.env_float("XAPI_TEST_FLOAT", 0.2) == 0.2
+    monkeypatch.setenv("XAPI_TEST_FLOAT", "1.5")
+    assert main.env_float("XAPI_TEST_FLOAT", 0.2) == 1.5
+
+    for raw in ("inf", "nan", "0", "2.5", "-1"):
+        monkeypatch.setenv("XAPI_TEST_INT", raw)
+        assert main.env_int("XAPI_TEST_INT", 2) == 2
+    monkeypatch.setenv("XAPI_TEST_INT", "4")
+    assert main.env_int("XAPI_TEST_INT", 2) == 4
@@ -0,0 +1,125 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+import main
+
+
+def test_upload_retries_after_server_disconnect(settings, mock_client, make_media):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            raise httpx.RemoteProtocolError("Server disconnected without sending a response.", request=request)
+        return httpx.Response(200, json={"media_id_string": "42"})
+
+    async def run():
+        async with mock_client(handler) as client:
+            return await main.upload_media_v1(settings, make_media(), client, 5)
+
+    assert asyncio.run(run()) == "42"
+    assert len(calls) == 2
+
+
+def post(client, deadline_s=5):
+    return main.post_with_retry(client, "test", main.time.monotonic() + deadline_s, data={"a": "b"})
+
+
+def test_post_with_retry_retries_5xx_then_returns_success(mock_client):
+    statuses = iter([503, 502, 200])
+
+    async def run():
+        async with mock_client(lambda request: httpx.Response(next(statuses))) as client:
+            return await post(client)
+
+    assert asyncio.run(run()).status_code == 200
+
+
+def test_post_with_retry_returns_last_response_after_max_attempts(mock_client):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(500)
+
+    async def run():
+        async with mock_client(handler) as client:
+            return await post(client)
+
+    assert asyncio.run(run()).status_code == 500
+    assert len(calls) == main.UPLOAD_ATTEMPTS
+
+
+def test_post_with_retry_does_not_retry_client_errors(mock_client):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(400)
+
+    async def run():
+        async with mock_client(handler) as client:
+            return await post(client)
+
+    assert asyncio.run(run()).status_code == 400
+    assert len(calls) == 1
+
+
+def test_post_with_retry_gives_up_when_retry_after_exceeds_deadline(mock_client):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(429, headers={"Retry-After": "60"})
+
+    async def run():
+        async with mock_client(handler) as client:
+            return await post(client, deadline_s=2)
+
+    assert asyncio.run(run()).status_code == 429
+    assert len(calls) == 1
+
+
+def test_post_with_retry_reraises_persistent_connection_errors(mock_client):
+    def handler(request):
+        raise httpx.ConnectError("refused", request=request)
+
+    async def run():
+        async with mock_client(handler) as client:
+            return await post(client)
+
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(run())
+
+
+def test_retry_delay_honours_retry_after_forms():
+    assert main.retry_delay(httpx.Response(429, headers={"Retry-After": "3"}), 0) == 3.0
+    # An HTTP-date in the past means "retry now".
+    past = httpx.Response(503, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})
+    assert main.retry_delay(past, 0) == 0.0
+    future = datetime.now(timezone.utc) + timedelta(seconds=30)
+    dated = httpx.Response(503, headers={"Retry-After": format_datetime(future, usegmt=True)})
+    assert 25 < main.retry_delay(dated, 0) <= 30
+
+
+def test_retry_delay_backs_off_exponentially_without_header():
+    garbage = httpx.Response(503, headers={"Retry-After": "soon"})
+    assert main.retry_delay(garbage, 0) == main.RETRY_BACKOFF
+    assert main.retry_delay(None, 2) == main.RETRY_BACKOFF * 4
+
+
+def test_create_tweet_retries_rate_limit(settings, mock_client):
+    statuses = iter([429, 201])
+
+    def handler(request):
+        return httpx.Response(next(statuses), json={"data": {"id": "99"}})
+
+    async def run():
+        async with mock_client(handler) as client:
+            return await main.create_tweet_v2(client, settings, "hello", ["1"])
+
+    assert asyncio.run(run()) == "99"
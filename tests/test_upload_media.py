@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import main
+
+
+def by_auth(oauth, bearer):
+    """Answer OAuth1-signed and bearer requests with different responses."""
+
+    def handler(request):
+        if request.headers["Authorization"].startswith("Bearer"):
+            return bearer(request)
+        return oauth(request)
+
+    return handler
+
+
+def upload(settings, mock_client, handler, path):
+    async def run():
+        async with mock_client(handler) as client:
+            started = time.monotonic()
+            media_id = await main.upload_media(settings, path, client)
+            return media_id, time.monotonic() - started
+
+    return asyncio.run(run())
+
+
+@pytest.fixture(params=[False, True], ids=["sequential", "race"])
+def race(request, monkeypatch):
+    monkeypatch.setattr(main, "RACE_UPLOADERS", request.param)
+    return request.param
+
+
+def test_first_uploader_wins(settings, mock_client, make_media, race):
+    calls = []
+
+    def ok(request):
+        calls.append(request)
+        return httpx.Response(200, json={"media_id_string": "1"})
+
+    media_id, _ = upload(settings, mock_client, ok, make_media().path)
+    assert media_id == "1"
+    assert len(calls) == 1
+
+
+def test_oauth1_rejection_skips_oauth1_uploaders_but_not_bearer(settings, mock_client, make_media, race):
+    oauth_calls = []
+
+    def rejected(request):
+        oauth_calls.append(request)
+        return httpx.Response(401)
+
+    handler = by_auth(rejected, lambda request: httpx.Response(200, json={"media_id_string": "B"}))
+    media_id, _ = upload(settings, mock_client, handler, make_media().path)
+    assert media_id == "B"
+    # v1 is rejected and the chunked uploader never runs.
+    assert len(oauth_calls) == 1
+
+
+def test_race_starts_the_next_uploader_when_the_previous_one_fails(
+    settings, mock_client, make_media, monkeypatch
+):
+    monkeypatch.setattr(main, "RACE_UPLOADERS", True)
+    monkeypatch.setattr(main, "RACE_STAGGER", 3.0)
+    handler = by_auth(
+        lambda request: httpx.Response(400),
+        lambda request: httpx.Response(200, json={"media_id_string": "B"}),
+    )
+    media_id, elapsed = upload(settings, mock_client, handler, make_media().path)
+    assert media_id == "B"
+    assert elapsed < 1.0
+
+
+def test_race_keeps_the_stagger_while_the_previous_uploader_runs(
+    settings, mock_client, make_media, monkeypatch
+):
+    monkeypatch.setattr(main, "RACE_UPLOADERS", True)
+    monkeypatch.setattr(main, "RACE_STAGGER", 0.3)
+    started = {}
+
+    async def handler(request):
+        kind = "bearer" if request.headers["Authorization"].startswith("Bearer") else "oauth"
+        started.setdefault(kind, time.monotonic())
+        if kind == "oauth":
+            await asyncio.sleep(1)
+            return httpx.Response(500)
+        return httpx.Response(200, json={"media_id_string": "B"})
+
+    media_id, _ = upload(settings, mock_client, handler, make_media().path)
+    assert media_id == "B"
+    assert started["bearer"] - started["oauth"] >= 0.25
+
+
+def test_all_uploaders_failing_returns_none(settings, mock_client, make_media, race):
+    media_id, _ = upload(settings, mock_client, lambda request: httpx.Response(400), make_media().path)
+    assert media_id is None
+
+
+def test_missing_file_raises_before_any_request(settings, mock_client, tmp_path, race):
+    with pytest.raises(FileNotFoundError):
+        upload(settings, mock_client, lambda request: pytest.fail("no request expected"), tmp_path / "nope.png")
@@ -0,0 +1,85 @@
+"""
+verify_credentials 结果缓存
+
+check_permissions.py 和 deploy_check.py 共用。以四项 OAuth1 凭证的 SHA256 为键，
+将 verify_credentials 的结果缓存在内存和 ~/.cache/xapi/verify.json 中（TTL 300 秒），
+短时间内重复运行检查脚本时无需再次请求 Twitter。
+"""
+
+import hashlib
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import orjson
+
+CACHE_FILE = Path.home() / ".cache" / "xapi" / "verify.json"
+CACHE_TTL = 300
+
+_memory_cache = {}
+
+
+def credential_hash(credentials):
+    """
+    凭证指纹，避免把明文凭证写入缓存文件
+
+    credentials 为 (api_key, api_secret, access_token, access_secret)；
+    任一项（包括 secret）变化都会得到不同的键，用分隔符避免拼接歧义。
+    """
+    return hashlib.sha256("\0".join(credentials).encode()).hexdigest()
+
+
+def _load_disk_cache():
+    try:
+        return orjson.loads(CACHE_FILE.read_bytes())
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_disk_cache(cache):
+    try:
+        CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        CACHE_FILE.write_bytes(orjson.dumps(cache))
+    except OSError:
+        # 缓存写入失败不影响检查结果
+        pass
+
+
+def cached_user(credentials):
+    """返回仍在有效期内的缓存用户信息（dict），没有则返回 None；不发起网络请求"""
+    key = credential_hash(credentials)
+    entry = _memory_cache.get(key) or _load_disk_cache().get(key)
+    if entry and entry[1] > time.time():
+        _memory_cache[key] = entry
+        return entry[0]
+    return None
+
+
+def verify_credentials(api, credentials):
+    """
+    返回 (user, from_cache)
+
+    user 为包含 screen_name / id / created_at / followers_count 的 SimpleNamespace。
+    认证失败时 tweepy 的异常会直接抛出，失败结果不会被缓存。
+    """
+    user_data = cached_user(credentials)
+    if user_data is not None:
+        return SimpleNamespace(**user_data), True
+
+    key = credential_hash(credentials)
+    user = api.verify_credentials()
+    user_data = {
+        "screen_name": user.screen_name,
+        "id": user.id,
+        "created_at": str(user.created_at),
+        "followers_count": user.followers_count,
+    }
+    now = time.time()
+    entry = (user_data, now + CACHE_TTL)
+    _memory_cache[key] = entry
+
+    cache = {k: v for k, v in _load_disk_cache().items() if v[1] > now}
+    cache[key] = entry
+    _save_disk_cache(cache)
+
+    return SimpleNamespace(**user_data), False